@@ -1,31 +1,53 @@
 import os
 import json
-from http.server import BaseHTTPRequestHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from groq import Groq
 
+# Keep Groq calls inside the function's 10s maxDuration (a single attempt, no SDK retries)
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT', '8'))
+
+# Prefer orjson for request parsing and response encoding when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def json_dumps(data) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data).encode()
+
+# Built once at import and reused across invocations of a warm function,
+# so the connection pool survives; None when the API key is missing
+_api_key = os.environ.get('GROQ_API_KEY')
+_client = Groq(api_key=_api_key, max_retries=0) if _api_key else None
+
 class handler(BaseHTTPRequestHandler):
+    def _send_json(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
     def do_POST(self):
         try:
-            # Get API key
-            api_key = os.environ.get('GROQ_API_KEY')
-            if not api_key:
-                self.send_response(500)
-                self.send_header('Content-type', 'application/json')
-                self.send_header('Access-Control-Allow-Origin', '*')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "API key not configured"}).encode())
+            if _client is None:
+                self._send_json(500, json_dumps({"error": "API key not configured"}))
                 return
             
             # Parse request
             content_length = int(self.headers['Content-Length'])
             post_data = self.rfile.read(content_length)
-            data = json.loads(post_data)
-            
-            # Initialize Groq
-            client = Groq(api_key=api_key)
+            data = json_loads(post_data)
             
             # Create prompt
-            system_prompt = """You are an expert productivity coach. Return a JSON object with "prioritized_tasks" array containing objects with "task", "priority" (High/Medium/Low), "reason", and "done" (false) fields."""
+            system_prompt = 'Prioritize the tasks for the goal. Return only JSON: {"prioritized_tasks":[{"task":str,"priority":"High|Medium|Low","reason":str,"done":false}]}'
             
             tasks_list = data.get('tasks', [])
             goal = data.get('goal', '')
@@ -33,34 +55,31 @@ class handler(BaseHTTPRequestHandler):
             user_prompt = f"Goal: {goal}\nTasks: {', '.join(tasks_list)}"
             
             # Get AI response
-            completion = client.chat.completions.create(
+            completion = _client.chat.completions.create(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
                 model="llama-3.1-8b-instant",
                 temperature=0.2,
-                response_format={"type": "json_object"}
+                max_tokens=max(256, 60 * len(tasks_list)),
+                response_format={"type": "json_object"},
+                timeout=REQUEST_TIMEOUT
             )
             
             # Send response
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            self.wfile.write(completion.choices[0].message.content.encode())
+            self._send_json(200, completion.choices[0].message.content.encode())
             
         except Exception as e:
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            error_msg = json.dumps({"error": str(e)})
-            self.wfile.write(error_msg.encode())
+            self._send_json(500, json_dumps({"error": str(e)}))
     
     def do_OPTIONS(self):
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-        self.end_headers()
\ No newline at end of file
+        self.end_headers()
+
+if __name__ == '__main__':
+    # Local runs: serve requests on separate threads so they don't queue behind each other
+    ThreadingHTTPServer(('0.0.0.0', 8000), handler).serve_forever()
\ No newline at end of file
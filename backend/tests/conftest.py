@@ -0,0 +1,48 @@
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def completion(content: str):
+    """Build an object shaped like a Groq chat completion."""
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+
+class FakeCompletions:
+    """Stand-in for client.chat.completions that records calls and delegates to `respond`."""
+
+    def __init__(self):
+        self.calls = []
+        self.respond = None
+
+    async def create(self, messages, **kwargs):
+        self.calls.append(messages)
+        return completion(await self.respond(messages))
+
+
+@pytest.fixture
+def main(tmp_path, monkeypatch):
+    """Import a fresh backend/main.py inside a temporary working directory."""
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "static").mkdir()
+
+    sys.modules.pop("main", None)
+    module = importlib.import_module("main")
+
+    async def no_warm_up(**kwargs):
+        return None
+
+    fake = FakeCompletions()
+    monkeypatch.setattr(module.client.chat.completions, "create", fake.create)
+    monkeypatch.setattr(module.client.models, "list", no_warm_up)
+    module.fake = fake
+    yield module
+    sys.modules.pop("main", None)
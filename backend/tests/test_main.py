@@ -0,0 +1,156 @@
+import asyncio
+import json
+import re
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+def answer(tasks, reason="ok"):
+    return {"prioritized_tasks": [{"task": task, "priority": "High", "reason": reason} for task in tasks]}
+
+
+def single_tasks(messages):
+    """Tasks listed in a single-request user prompt."""
+    return re.findall(r"^- (.*)$", messages[1]["content"], re.MULTILINE)
+
+
+def is_batch(main, messages):
+    return messages[0]["content"] == main.BATCH_SYSTEM_PROMPT
+
+
+def run_batched(main, requests):
+    """Send requests through the batcher concurrently and return results or exceptions."""
+    async def run():
+        main._batch_queue = asyncio.Queue()
+        worker = asyncio.create_task(main._batch_worker(main._batch_queue))
+        try:
+            return await asyncio.gather(*(main.prioritize(r) for r in requests), return_exceptions=True)
+        finally:
+            worker.cancel()
+            main._batch_queue = None
+
+    return asyncio.run(run())
+
+
+def make_requests(main, count):
+    return [main.TaskRequest(goal=f"goal {i}", tasks=[f"task {i}"]) for i in range(count)]
+
+
+def test_batch_success_uses_one_call(main):
+    async def respond(messages):
+        requests = json.loads(messages[1]["content"])
+        return json.dumps({"results": [{"id": r["id"], **answer(r["tasks"], "batched")} for r in requests]})
+
+    main.fake.respond = respond
+    results = run_batched(main, make_requests(main, 3))
+
+    assert len(main.fake.calls) == 1
+    assert is_batch(main, main.fake.calls[0])
+    assert [r["prioritized_tasks"][0]["task"] for r in results] == ["task 0", "task 1", "task 2"]
+    assert all(r["prioritized_tasks"][0]["reason"] == "batched" for r in results)
+
+
+@pytest.mark.parametrize("mangle", ["missing", "paraphrased"])
+def test_batch_falls_back_only_for_unusable_ids(main, mangle):
+    async def respond(messages):
+        if not is_batch(main, messages):
+            return json.dumps(answer(single_tasks(messages), "single"))
+        results = []
+        for r in json.loads(messages[1]["content"]):
+            if r["id"] == 0:
+                if mangle == "missing":
+                    continue
+                r["tasks"] = [task.upper() for task in r["tasks"]]
+            results.append({"id": r["id"], **answer(r["tasks"], "batched")})
+        return json.dumps({"results": results})
+
+    main.fake.respond = respond
+    results = run_batched(main, make_requests(main, 3))
+
+    assert len(main.fake.calls) == 2
+    assert [r["prioritized_tasks"][0]["reason"] for r in results] == ["single", "batched", "batched"]
+    assert results[0]["prioritized_tasks"][0]["task"] == "task 0"
+
+
+def test_unusable_batch_fails_without_fallback(main):
+    async def respond(messages):
+        requests = json.loads(messages[1]["content"])
+        return json.dumps({"results": [{"id": r["id"], **answer(["something else"])} for r in requests]})
+
+    main.fake.respond = respond
+    results = run_batched(main, make_requests(main, 3))
+
+    assert len(main.fake.calls) == 1
+    assert all(isinstance(r, main.HTTPException) and r.status_code == 500 for r in results)
+
+
+def test_batch_timeout_propagates_without_fallback(main):
+    async def respond(messages):
+        raise asyncio.TimeoutError()
+
+    main.fake.respond = respond
+    results = run_batched(main, make_requests(main, 3))
+
+    # One batched attempt plus its retry, and no per-request calls
+    assert len(main.fake.calls) == main.REQUEST_RETRIES + 1
+    assert all(isinstance(r, main.HTTPException) and "timed out" in r.detail for r in results)
+
+
+def test_cache_hit_ignores_task_order(main):
+    async def respond(messages):
+        return json.dumps(answer(single_tasks(messages)))
+
+    main.fake.respond = respond
+    client = TestClient(main.app)
+
+    first = client.post("/api/prioritize", json={"goal": "g", "tasks": ["a", "b"]})
+    second = client.post("/api/prioritize", json={"goal": "g", "tasks": ["b", "a"]})
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert len(main.fake.calls) == 1
+
+
+def test_malformed_answer_is_rejected_and_not_cached(main):
+    async def respond(messages):
+        return json.dumps({"prioritized_tasks": [{"name": "a", "prio": 1}]})
+
+    main.fake.respond = respond
+    client = TestClient(main.app)
+
+    for _ in range(2):
+        response = client.post("/api/prioritize", json={"goal": "g", "tasks": ["a"]})
+        assert response.status_code == 500
+    assert len(main.fake.calls) == 2
+
+
+def read_latest(main):
+    with open(main.LATEST_FILE) as f:
+        return json.load(f)
+
+
+def test_save_then_debounced_toggle_flush(main, monkeypatch):
+    monkeypatch.setattr(main, "FLUSH_DELAY", 0.05)
+    tasks = [{"task": "a", "priority": "High", "reason": "r"}, {"task": "b", "priority": "Low", "reason": "r"}]
+
+    with TestClient(main.app) as client:
+        saved = client.post("/api/save", json={"prioritized_tasks": tasks})
+        assert saved.status_code == 200
+        with open(saved.json()["filename"]) as f:
+            assert json.load(f) == read_latest(main)
+
+        assert client.put("/api/tasks/0", json={"task_index": 0, "done": True}).status_code == 200
+        assert client.put("/api/tasks/1", json={"task_index": 1, "done": True}).status_code == 200
+        # Served from memory right away, written to disk only after the debounce delay
+        assert [t["done"] for t in client.get("/api/load").json()["prioritized_tasks"]] == [True, True]
+        assert [t["done"] for t in read_latest(main)["prioritized_tasks"]] == [False, False]
+
+        time.sleep(0.3)
+        assert [t["done"] for t in read_latest(main)["prioritized_tasks"]] == [True, True]
+
+        # A pending toggle is still written when the app shuts down
+        client.put("/api/tasks/0", json={"task_index": 0, "done": False})
+
+    assert [t["done"] for t in read_latest(main)["prioritized_tasks"]] == [False, True]